@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+AutoDubber command line. Each subcommand imports only what it needs, so one-off runs and
+short-lived workers do not pay for Whisper/OpenCV/Google client imports they never use.
+
+  python autodub.py poll [--store]          poll the source channel once and queue new videos
+  python autodub.py process FILE [--lang L]  dub a local video file (all TARGETS by default)
+  python autodub.py upload FILE --title T    upload a finished video to YouTube
+  python autodub.py run                      poll/process loop (same as pipeline_main.py)
+  python autodub.py worker                   worker mode (same as worker.py)
+  python autodub.py bench                    measure the import time of modules and heavy dependencies
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BENCH_MODULES = [
+    'autodub', 'pipeline_main', 'worker', 'processor', 'driver', 'uploader', 'watcher', 'fingerprint',
+    'numpy', 'requests', 'cv2', 'gtts', 'googleapiclient.discovery', 'whisper',
+]
+
+
+def cmd_poll(args):
+    from pipeline_main import init_runtime
+    from watcher import poll_channel_entries
+    cfg = init_runtime()
+    entries = poll_channel_entries(cfg['SOURCE_CHANNEL_ID'])
+    if args.store:
+        from jobstore import JobStore
+        added = JobStore.from_config(cfg.get('WORKER', {}), cfg.get('QUEUE', {})).enqueue(entries)
+    else:
+        from job_queue import JobQueue
+        added = JobQueue.from_config(cfg.get('QUEUE', {})).extend(entries)
+    for vid in added:
+        print(vid)
+    return 0
+
+
+def cmd_process(args):
+    from pipeline_main import init_runtime, get_targets, processing_options
+    from processor import process_video_file_multi
+    cfg = init_runtime()
+    targets = get_targets(cfg)
+    langs = args.lang or [t['LANG'] for t in targets]
+    tts_langs = {t['LANG']: t['TTS_LANG'] for t in targets}
+    outputs = process_video_file_multi(args.file, langs, tts_langs=tts_langs, **processing_options(cfg))
+    print(json.dumps(outputs, indent=2))
+    return 0 if any(outputs.values()) else 1
+
+
+def cmd_upload(args):
+    from pipeline_main import init_runtime
+    from uploader import get_youtube_service, upload_video_to_youtube
+    cfg = init_runtime()
+    service = get_youtube_service(args.client_secrets or cfg['YOUTUBE']['CLIENT_SECRETS_FILE'],
+                                  args.credentials_store or cfg['YOUTUBE']['CREDENTIALS_STORE'])
+    resp = upload_video_to_youtube(service, args.file, args.title, args.description, privacy=args.privacy)
+    print(resp.get('id'))
+    return 0
+
+
+def cmd_run(args):
+    from pipeline_main import main_loop
+    main_loop()
+
+
+def cmd_worker(args):
+    from worker import worker_loop
+    worker_loop(args.worker_id)
+
+
+def import_time(module, repeat):
+    """Median wall time (seconds) of importing `module` in a fresh interpreter, or None if it fails."""
+    code = ('import time; t = time.perf_counter(); import {}; print(time.perf_counter() - t)').format(module)
+    here = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, '-c', code], cwd=here, capture_output=True, text=True)
+        if proc.returncode != 0:
+            return None
+        times.append(float(proc.stdout.strip().splitlines()[-1]))
+    return statistics.median(times)
+
+
+def cmd_bench(args):
+    modules = args.modules or BENCH_MODULES
+    results = {m: import_time(m, args.repeat) for m in modules}
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    width = max(len(m) for m in modules)
+    for m, t in results.items():
+        print(f'{m:<{width}}  ' + ('not installed / failed' if t is None else f'{t * 1000:8.1f} ms'))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='autodub', description='AutoDubber command line')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('poll', help='poll the source channel once and queue new videos')
+    p.add_argument('--store', action='store_true', help='queue into the shared worker job store (WORKER.DB_PATH)')
+    p.set_defaults(func=cmd_poll)
+
+    p = sub.add_parser('process', help='dub a local video file')
+    p.add_argument('file')
+    p.add_argument('--lang', action='append', help='target language (repeatable); defaults to all TARGETS')
+    p.set_defaults(func=cmd_process)
+
+    p = sub.add_parser('upload', help='upload a finished video to YouTube')
+    p.add_argument('file')
+    p.add_argument('--title', required=True)
+    p.add_argument('--description', default='')
+    p.add_argument('--privacy', default='public', choices=['public', 'unlisted', 'private'])
+    p.add_argument('--client-secrets')
+    p.add_argument('--credentials-store')
+    p.set_defaults(func=cmd_upload)
+
+    p = sub.add_parser('run', help='poll/process loop')
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser('worker', help='worker mode with leased jobs')
+    p.add_argument('--worker-id')
+    p.set_defaults(func=cmd_worker)
+
+    p = sub.add_parser('bench', help='measure import time of modules and heavy dependencies')
+    p.add_argument('modules', nargs='*', help=f'modules to time (default: {", ".join(BENCH_MODULES)})')
+    p.add_argument('--repeat', type=int, default=3)
+    p.add_argument('--json', action='store_true')
+    p.set_defaults(func=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
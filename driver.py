@@ -6,29 +6,25 @@ Supports optional cookies file for age-restricted or bot-protected videos.
 import subprocess
 import json
 import logging
-import requests
-import isodate
-import cv2
 from pathlib import Path
-from utils import ensure_dir, load_config
+from utils import get_config, get_tmp_dir
+import resources
+from job_queue import cached_duration, cache_durations
 import os
 
-cfg = load_config('config.json')
-TMP = cfg.get('TMP_DIR', '/tmp/autodubber')
-ensure_dir(TMP)
-
-API_KEY = cfg["YOUTUBE"].get("API_KEY")
-
 # الخيار الافتراضي: ملف الكوكيز في مجلد config
 DEFAULT_COOKIES_FILE = Path('config') / 'cookies.txt'
 
 # السماح بالاستبدال بواسطة متغير البيئة
 COOKIES_FILE = Path(os.environ.get("YOUTUBE_COOKIES_FILE", DEFAULT_COOKIES_FILE))
 
-# حدود الطول
-MAX_NORMAL = cfg.get("VIDEO_FILTER", {}).get("MAX_DURATION_NORMAL", 900)   # 15 دقيقة
-MAX_SHORT = cfg.get("VIDEO_FILTER", {}).get("MAX_DURATION_SHORT", 60)     # 60 ثانية
-MIN_DUR = cfg.get("VIDEO_FILTER", {}).get("MIN_DURATION", 5)
+
+def duration_limits():
+    """حدود الطول: (MIN, MAX_NORMAL, MAX_SHORT) بالثواني"""
+    f = get_config().get("VIDEO_FILTER", {})
+    return (f.get("MIN_DURATION", 5),
+            f.get("MAX_DURATION_NORMAL", 900),   # 15 دقيقة
+            f.get("MAX_DURATION_SHORT", 60))     # 60 ثانية
 
 
 def is_video_cc(video_id):
@@ -51,12 +47,18 @@ def is_video_cc(video_id):
 
 def get_video_duration_api(video_id):
     """جلب مدة الفيديو بالثواني من YouTube Data API"""
-    if not API_KEY:
+    cached = cached_duration(video_id)
+    if cached:
+        return cached
+    api_key = get_config().get("YOUTUBE", {}).get("API_KEY")
+    if not api_key:
         logging.warning("API_KEY not set. Duration check skipped.")
         return None
     url = "https://www.googleapis.com/youtube/v3/videos"
-    params = {"id": video_id, "part": "contentDetails", "key": API_KEY}
+    params = {"id": video_id, "part": "contentDetails", "key": api_key}
     try:
+        import requests
+        import isodate
         resp = requests.get(url, params=params, timeout=10)
         data = resp.json()
         items = data.get("items", [])
@@ -65,6 +67,7 @@ def get_video_duration_api(video_id):
             return None
         duration_str = items[0]["contentDetails"]["duration"]
         duration = isodate.parse_duration(duration_str).total_seconds()
+        cache_durations({video_id: duration})
         return duration
     except Exception as e:
         logging.error("API duration check failed for %s: %s", video_id, e)
@@ -80,7 +83,8 @@ def get_video_duration(video_path):
             '-of', 'default=noprint_wrappers=1:nokey=1',
             video_path
         ]
-        result = subprocess.check_output(cmd, stderr=subprocess.DEVNULL)
+        with resources.slot('ffmpeg'):
+            result = subprocess.check_output(cmd, stderr=subprocess.DEVNULL)
         return float(result.decode().strip())
     except Exception as e:
         logging.error(f"Could not get duration for {video_path}: {e}")
@@ -90,27 +94,32 @@ def get_video_duration(video_path):
 def is_short_format(video_path):
     """يتحقق إن كان الفيديو عمودي (short) باستخدام OpenCV"""
     try:
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            return False
-        width = cap.get(cv2.CAP_PROP_FRAME_WIDTH)
-        height = cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
-        cap.release()
+        import cv2
+        with resources.slot('opencv') as threads:
+            cv2.setNumThreads(threads)
+            cap = cv2.VideoCapture(video_path)
+            if not cap.isOpened():
+                return False
+            width = cap.get(cv2.CAP_PROP_FRAME_WIDTH)
+            height = cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+            cap.release()
         return height > width  # إذا الارتفاع أكبر => عمودي => Short
     except Exception as e:
         logging.warning(f"Could not determine format of {video_path}: {e}")
         return False
 
 
-def download_video(video_id, out_dir=TMP):
+def download_video(video_id, out_dir=None):
     """Download video after checking its type (short/normal)"""
+    out_dir = out_dir or get_tmp_dir()
+    min_dur, max_normal, max_short = duration_limits()
     # التحقق من الطول عبر API
     dur = get_video_duration_api(video_id)
     if dur is not None:
-        if dur < MIN_DUR:
+        if dur < min_dur:
             logging.info("Skipping %s: too short (%.1fs)", video_id, dur)
             return None
-        if dur > MAX_NORMAL:  # إذا تجاوز 15 دقيقة يرفض مباشرة
+        if dur > max_normal:  # إذا تجاوز 15 دقيقة يرفض مباشرة
             logging.info("Skipping %s: too long (%.1fs)", video_id, dur)
             return None
 
@@ -133,7 +142,7 @@ def download_video(video_id, out_dir=TMP):
     for f in p.glob(f'{video_id}.*'):
         if f.suffix.lower() in ['.mp4', '.mkv', '.webm']:
             # تحقق إن كان Short
-            if dur is not None and dur <= MAX_SHORT:
+            if dur is not None and dur <= max_short:
                 logging.info("%s detected as SHORT (%.1fs)", video_id, dur)
             else:
                 logging.info("%s detected as NORMAL video (%.1fs)", video_id, dur if dur else 0)
@@ -0,0 +1,193 @@
+"""
+Audio fingerprinting for duplicate-content detection.
+Computes a compact band-energy hash (one 32-bit sub-fingerprint per 64 ms, Haitsma/Kalker style
+band-energy differences) from the 16 kHz mono WAV produced by extract_audio, and keeps an SQLite index
+of past fingerprints so re-uploads / re-titled copies of the same content can be skipped or can reuse
+the cached transcription.
+"""
+import json
+import logging
+import sqlite3
+import time
+import wave
+from contextlib import closing
+import numpy as np
+
+SAMPLE_RATE = 16000        # rate of the WAVs written by extract_audio
+FRAME_SIZE = 4096          # 256 ms at 16 kHz
+HOP_SIZE = 1024            # 64 ms at 16 kHz
+NUM_BANDS = 33             # 33 bands -> 32 bits per sub-fingerprint
+MIN_FREQ, MAX_FREQ = 300.0, 2000.0
+
+DEFAULT_THRESHOLD = 0.35   # max bit error rate for two fingerprints to count as the same content
+DURATION_TOLERANCE = 0.1   # candidates must be within 10% of the query duration
+MIN_OVERLAP = 0.5          # aligned part must cover at least half of the shorter fingerprint
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS fingerprints (
+    video_id TEXT PRIMARY KEY,
+    duration REAL NOT NULL,
+    fp BLOB NOT NULL,
+    transcript TEXT,
+    added_at REAL
+);
+CREATE INDEX IF NOT EXISTS fingerprints_duration ON fingerprints (duration);
+'''
+
+
+class DuplicateContent(Exception):
+    """Raised when a video's audio matches content that was already processed."""
+
+    def __init__(self, video_id, match_id, ber):
+        super().__init__(f'{video_id} duplicates {match_id} (bit error rate {ber:.3f})')
+        self.video_id = video_id
+        self.match_id = match_id
+        self.ber = ber
+
+
+def _band_edges(sample_rate):
+    freqs = np.geomspace(MIN_FREQ, MAX_FREQ, NUM_BANDS + 1)
+    return np.round(freqs * FRAME_SIZE / sample_rate).astype(int)
+
+
+def compute_fingerprint(wav_path):
+    """Return (fingerprint as np.uint32 array, duration in seconds) for a mono 16-bit WAV.
+    The file is read in chunks, so memory does not depend on its length.
+    """
+    with wave.open(str(wav_path), 'rb') as w:
+        sample_rate = w.getframerate()
+        duration = w.getnframes() / float(sample_rate)
+        edges = _band_edges(sample_rate)
+        window = np.hanning(FRAME_SIZE)
+        energies = []
+        buf = np.zeros(0, dtype=np.float32)
+        while True:
+            chunk = w.readframes(HOP_SIZE * 256)
+            if not chunk:
+                break
+            buf = np.concatenate([buf, np.frombuffer(chunk, dtype='<i2').astype(np.float32)])
+            n = (len(buf) - FRAME_SIZE) // HOP_SIZE + 1
+            if n <= 0:
+                continue
+            idx = np.arange(FRAME_SIZE)[None, :] + HOP_SIZE * np.arange(n)[:, None]
+            power = np.abs(np.fft.rfft(buf[idx] * window, axis=1)) ** 2
+            energies.append(np.stack([power[:, lo:hi].sum(axis=1) for lo, hi in zip(edges[:-1], edges[1:])], axis=1))
+            buf = buf[n * HOP_SIZE:]
+
+    if not energies:
+        return np.zeros(0, dtype=np.uint32), duration
+    e = np.concatenate(energies)
+    diff = e[:, :-1] - e[:, 1:]                 # energy difference between adjacent bands
+    bits = (diff[1:] - diff[:-1]) > 0           # ... and its change over time
+    weights = (np.uint32(1) << np.arange(NUM_BANDS - 1, dtype=np.uint32))
+    return (bits.astype(np.uint32) * weights).sum(axis=1).astype(np.uint32), duration
+
+
+def bit_error_rate(a, b):
+    """Fraction of differing bits between two equally long fingerprints."""
+    if len(a) == 0:
+        return 1.0
+    xor = np.bitwise_xor(a, b)
+    return float(np.unpackbits(xor.view(np.uint8)).sum()) / (len(a) * 32)
+
+
+def _best_offset(query, ref):
+    """Offset of ref relative to query with the most exactly matching sub-fingerprints."""
+    positions = {}
+    for j, v in enumerate(ref.tolist()):
+        positions.setdefault(v, j)
+    votes = {}
+    for i, v in enumerate(query.tolist()):
+        j = positions.get(v)
+        if j is not None:
+            votes[j - i] = votes.get(j - i, 0) + 1
+    return max(votes, key=votes.get) if votes else 0
+
+
+def align_fingerprints(query, ref):
+    """Return (bit error rate, offset) of query vs. ref at their best alignment; the rate is 1.0 if
+    they barely overlap. Sub-fingerprint i of query lines up with sub-fingerprint i + offset of ref.
+    """
+    offset = _best_offset(query, ref)
+    q0, r0 = max(0, -offset), max(0, offset)
+    n = min(len(query) - q0, len(ref) - r0)
+    if n <= 0 or n < MIN_OVERLAP * min(len(query), len(ref)):
+        return 1.0, offset
+    return bit_error_rate(query[q0:q0 + n], ref[r0:r0 + n]), offset
+
+
+def match_fingerprints(query, ref):
+    """Return the bit error rate of query vs. ref at their best alignment (1.0 if they barely overlap)."""
+    return align_fingerprints(query, ref)[0]
+
+
+class FingerprintIndex:
+    """SQLite index of fingerprints of processed videos plus their cached transcriptions.
+    Every lookup reads the current rows, so workers sharing one database (worker mode uses
+    WORKER.DB_PATH) see each other's entries and never overwrite them.
+    """
+
+    def __init__(self, db_path='fingerprints.sqlite', threshold=DEFAULT_THRESHOLD):
+        self.db_path = db_path
+        self.threshold = threshold
+        self._pending = {}
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.db_path, timeout=60, isolation_level=None))
+
+    def lookup(self, fp, duration, video_id=None):
+        """Return (video_id, bit error rate, shift) of the closest indexed duplicate, or None.
+        shift is how many seconds later the matched content plays in the query than in the original
+        (e.g. 5.0 for a copy with a 5 s intro added); add it to the original's timings to reuse them.
+        video_id is the id of the query itself; its own entry (from an earlier attempt) never matches.
+        """
+        # superset of the DURATION_TOLERANCE window; the exact check is done below
+        lo, hi = duration * (1 - DURATION_TOLERANCE), duration / (1 - DURATION_TOLERANCE)
+        with self._connect() as db:
+            rows = db.execute('SELECT video_id, duration, fp FROM fingerprints '
+                              'WHERE duration BETWEEN ? AND ? AND video_id != ?',
+                              (lo, hi, video_id or '')).fetchall()
+        best = None
+        for vid, ref_duration, blob in rows:
+            if abs(ref_duration - duration) > DURATION_TOLERANCE * max(ref_duration, duration):
+                continue
+            ber, offset = align_fingerprints(fp, np.frombuffer(blob, dtype=np.uint32))
+            if ber <= self.threshold and (best is None or ber < best[1]):
+                best = (vid, ber, -offset * HOP_SIZE / SAMPLE_RATE)
+        return best
+
+    def add(self, video_id, fp, duration, segments=None):
+        """Index a fingerprint (and optionally its transcription)."""
+        transcript = json.dumps(segments, ensure_ascii=False) if segments is not None else None
+        with self._connect() as db:
+            db.execute('INSERT OR REPLACE INTO fingerprints (video_id, duration, fp, transcript, added_at) '
+                       'VALUES (?, ?, ?, ?, ?)',
+                       (video_id, duration, fp.astype(np.uint32).tobytes(), transcript, time.time()))
+
+    def hold(self, video_id, fp, duration, segments=None):
+        """Keep a fingerprint in memory until commit(video_id), i.e. until the video was published."""
+        self._pending[video_id] = (fp, duration, segments)
+
+    def commit(self, video_id):
+        """Index a fingerprint kept by hold(); does nothing if there is none."""
+        pending = self._pending.pop(video_id, None)
+        if pending is not None:
+            self.add(video_id, *pending)
+
+    def discard(self, video_id):
+        """Forget a fingerprint kept by hold() without indexing it."""
+        self._pending.pop(video_id, None)
+
+    def load_transcript(self, video_id):
+        """Return the cached segments of an indexed video, or None."""
+        with self._connect() as db:
+            row = db.execute('SELECT transcript FROM fingerprints WHERE video_id = ?', (video_id,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        try:
+            return json.loads(row[0])
+        except ValueError as e:
+            logging.warning(f"Could not read cached transcript of {video_id}: {e}")
+            return None
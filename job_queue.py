@@ -0,0 +1,220 @@
+"""
+Priority ordering of pending videos.
+Jobs are ordered by estimated processing cost (from the cached video duration), how fresh the
+source upload is and a configurable publish-latency target, with aging so long videos still run:
+
+  1. starving: waited longer than MAX_WAIT                  -> oldest first
+  2. on time:  can still be published within the target     -> least slack first
+  3. the rest: est_cost - AGING * seconds waited            -> smallest first
+
+Starving jobs only take turns with on-time ones: while on-time jobs are waiting, one starving
+job runs after every STARVING_EVERY other jobs, so a large backlog cannot hold up fresh uploads.
+
+est_cost = FIXED_COST + COST_PER_SECOND * duration, and the latency target is counted from the
+source publish time (or from when the job was first seen if that is unknown).
+"""
+import fcntl
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+QUEUE_STORE = 'job_queue.json'
+DURATION_CACHE = 'durations.json'
+DEFAULT_DURATION = 600  # used for the cost estimate when a video's duration is unknown
+POLL_LIMIT = 20         # new jobs taken from one poll (newest first); the rest come with later polls
+MAX_ATTEMPTS = 3        # a job that failed this many times is given up
+RETRY_DELAY = 60        # seconds before a failed job may run again
+
+
+def _load_json(path, default):
+    p = Path(path)
+    if not p.exists():
+        return default
+    try:
+        return json.loads(p.read_text(encoding='utf-8'))
+    except Exception:
+        return default
+
+
+@contextmanager
+def _locked(path):
+    """Hold an exclusive lock on `path` (through path.lock) for read-modify-write updates."""
+    with open(f'{path}.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _write_json(path, data):
+    """Replace the file atomically so readers never see it half-written."""
+    tmp = Path(f'{path}.{os.getpid()}.tmp')
+    tmp.write_text(json.dumps(data), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def load_durations():
+    """Return the whole duration cache {video_id: seconds}; read it once when looking up many videos."""
+    return _load_json(DURATION_CACHE, {})
+
+
+def cached_duration(video_id):
+    """Return the cached duration of a video in seconds, or None."""
+    return load_durations().get(video_id)
+
+
+def cache_durations(durations):
+    """Merge {video_id: seconds} into the duration cache.
+    The file is re-read under a lock and replaced atomically, so processes sharing a host do not
+    drop each other's entries or read a half-written file.
+    """
+    durations = {k: v for k, v in durations.items() if v}
+    if not durations:
+        return
+    with _locked(DURATION_CACHE):
+        cache = _load_json(DURATION_CACHE, {})
+        cache.update(durations)
+        _write_json(DURATION_CACHE, cache)
+
+
+QUEUE_DEFAULTS = {
+    'PUBLISH_LATENCY_TARGET': 1800,
+    'COST_PER_SECOND': 3.0,
+    'FIXED_COST': 120,
+    'AGING': 0.5,
+    'MAX_WAIT': 6 * 3600,
+    'STARVING_EVERY': 3,
+}
+
+
+def queue_settings(settings=None):
+    """Ordering settings from the QUEUE config section, with defaults filled in."""
+    out = dict(QUEUE_DEFAULTS)
+    out.update({k: v for k, v in (settings or {}).items() if k in QUEUE_DEFAULTS})
+    return out
+
+
+def is_starving(job, now, settings):
+    """True if the job has waited longer than MAX_WAIT."""
+    return now - job['first_seen'] >= settings['MAX_WAIT']
+
+
+def job_priority(job, now, settings):
+    """Sort key for a job (smaller runs first); see the module docstring."""
+    duration = job.get('duration') or DEFAULT_DURATION
+    est_cost = settings['FIXED_COST'] + settings['COST_PER_SECOND'] * duration
+    waited = now - job['first_seen']
+    if is_starving(job, now, settings):
+        return (0, job['first_seen'])
+    deadline = (job.get('published') or job['first_seen']) + settings['PUBLISH_LATENCY_TARGET']
+    slack = deadline - now - est_cost
+    if slack >= 0:
+        return (1, slack)
+    return (2, est_cost - settings['AGING'] * waited)
+
+
+def pick_job(jobs, now, settings, since_starving):
+    """Return the job to run next from a non-empty list. since_starving is the number of jobs
+    picked since the last starving one; a starving job is picked when no job is on time, or once
+    STARVING_EVERY other jobs ran (see the module docstring).
+    """
+    starving = [j for j in jobs if is_starving(j, now, settings)]
+    rest = [j for j in jobs if not is_starving(j, now, settings)]
+    on_time = any(job_priority(j, now, settings)[0] == 1 for j in rest)
+    if starving and (not on_time or since_starving >= settings['STARVING_EVERY']):
+        return min(starving, key=lambda j: j['first_seen'])
+    return min(rest, key=lambda j: job_priority(j, now, settings))
+
+
+class JobQueue:
+    """Persistent priority queue of video jobs ({'id', 'duration', 'published', 'first_seen'}).
+    Every change re-reads the store under a lock before saving, so jobs queued by another process
+    (e.g. `autodub.py poll` next to a running loop) are merged rather than overwritten.
+    """
+
+    def __init__(self, store=QUEUE_STORE, settings=None, poll_limit=POLL_LIMIT,
+                 max_attempts=MAX_ATTEMPTS, retry_delay=RETRY_DELAY):
+        self.store = Path(store)
+        self.settings = queue_settings(settings)
+        self.poll_limit = poll_limit
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._since_starving = 0
+        self._jobs = _load_json(self.store, {})
+
+    @classmethod
+    def from_config(cls, settings):
+        """Build from the QUEUE config section."""
+        return cls(settings.get('STORE', QUEUE_STORE), settings,
+                   settings.get('POLL_LIMIT', POLL_LIMIT),
+                   settings.get('MAX_ATTEMPTS', MAX_ATTEMPTS),
+                   settings.get('RETRY_DELAY', RETRY_DELAY))
+
+    def __len__(self):
+        return len(self._jobs)
+
+    @contextmanager
+    def _update(self):
+        with _locked(self.store):
+            self._jobs = _load_json(self.store, {})
+            yield
+            _write_json(self.store, self._jobs)
+
+    def _add(self, video_id, duration=None, published=None, durations=None):
+        job = self._jobs.get(video_id)
+        if job is None:
+            job = self._jobs[video_id] = {'id': video_id, 'first_seen': time.time()}
+        if durations is None:
+            durations = {video_id: cached_duration(video_id)}
+        duration = duration or job.get('duration') or durations.get(video_id)
+        if duration:
+            job['duration'] = duration
+        if published:
+            job['published'] = published
+
+    def push(self, video_id, duration=None, published=None):
+        """Add a job; a job already queued keeps its first_seen time (and so its aging)."""
+        with self._update():
+            self._add(video_id, duration, published)
+
+    def extend(self, entries):
+        """Push several {'id', 'duration', 'published'} entries (see watcher.poll_channel_entries).
+        At most poll_limit of them become new jobs; entries already queued are only updated.
+        Returns the ids of the new jobs.
+        """
+        durations = load_durations()
+        added = []
+        with self._update():
+            for e in entries:
+                if e['id'] not in self._jobs:
+                    if self.poll_limit and len(added) >= self.poll_limit:
+                        continue
+                    added.append(e['id'])
+                self._add(e['id'], e.get('duration'), e.get('published'), durations)
+        return added
+
+    def retry(self, job):
+        """Put a failed job back with its original first_seen (so it keeps its aging), to run again
+        after retry_delay; returns False, leaving it out, once it has failed max_attempts times.
+        """
+        job = dict(job, attempts=job.get('attempts', 0) + 1)
+        if job['attempts'] >= self.max_attempts:
+            return False
+        job['not_before'] = time.time() + self.retry_delay
+        with self._update():
+            self._jobs[job['id']] = job
+        return True
+
+    def pop(self):
+        """Remove and return the job to run next, or None if no job is ready."""
+        now = time.time()
+        with self._update():
+            ready = [j for j in self._jobs.values() if j.get('not_before', 0) <= now]
+            if not ready:
+                return None
+            job = pick_job(ready, now, self.settings, self._since_starving)
+            del self._jobs[job['id']]
+        self._since_starving = 0 if is_starving(job, now, self.settings) else self._since_starving + 1
+        logging.info('Next job %s (priority %s, %d left)', job['id'], job_priority(job, now, self.settings), len(self._jobs))
+        return job
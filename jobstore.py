@@ -0,0 +1,294 @@
+"""
+Shared job queue for worker mode, backed by SQLite (put the database on a volume every node can reach).
+Workers claim jobs under a time-limited lease and renew it with heartbeats; a job whose lease expired
+is handed to the next worker that asks. Every claim bumps a lease token, and all writes from a worker
+(heartbeat, upload bookkeeping, completion) must present the current token, so a worker that lost its
+lease can no longer report results or start uploads.
+Uploads are recorded per (video, language) before they start, so a reclaimed job never uploads the same
+dub twice: a dub whose upload was started by a worker that then died is left for manual checking
+rather than uploaded again. An upload that fails with an error has its record removed, so it is retried.
+Note: SQLite relies on file locks; use a volume with working POSIX locks (not all NFS setups have them).
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from job_queue import queue_settings, is_starving, pick_job, load_durations, POLL_LIMIT
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    video_id TEXT PRIMARY KEY,
+    state TEXT NOT NULL DEFAULT 'queued',   -- queued | leased | done | failed
+    duration REAL,
+    published REAL,
+    first_seen REAL NOT NULL,
+    lease_owner TEXT,
+    lease_token INTEGER NOT NULL DEFAULT 0,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS uploads (
+    video_id TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    state TEXT NOT NULL,                    -- started | done
+    youtube_id TEXT,
+    worker TEXT,
+    updated_at REAL,
+    PRIMARY KEY (video_id, lang)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+'''
+
+
+def default_worker_id():
+    """host:pid, unique for every worker process."""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class Lease:
+    """A claimed job: the video id plus the token proving the claim is still current."""
+
+    def __init__(self, video_id, token, worker_id):
+        self.video_id = video_id
+        self.token = token
+        self.worker_id = worker_id
+
+
+class JobStore:
+    """SQLite job queue with leases; safe to share between processes and hosts."""
+
+    def __init__(self, db_path, lease_seconds=900, max_attempts=3, ordering=None, poll_limit=POLL_LIMIT):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_limit = poll_limit
+        # same ordering as the single-process queue (see job_queue)
+        self.ordering = queue_settings(ordering)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @classmethod
+    def from_config(cls, settings, ordering=None):
+        """Build from the WORKER config section (ordering: the QUEUE section)."""
+        return cls(settings.get('DB_PATH', 'autodubber_jobs.sqlite'),
+                   settings.get('LEASE_SECONDS', 900),
+                   settings.get('MAX_ATTEMPTS', 3),
+                   ordering,
+                   (ordering or {}).get('POLL_LIMIT', POLL_LIMIT))
+
+    def _connect(self):
+        # autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+        return _Connection(sqlite3.connect(self.db_path, timeout=60, isolation_level=None))
+
+    def enqueue(self, entries):
+        """Add {'id', 'duration', 'published'} entries; known jobs (in any state) are left alone.
+        At most poll_limit new jobs are added per call, in the order given (newest first from a poll).
+        Returns the ids of the new jobs.
+        """
+        now = time.time()
+        durations = load_durations()  # read before taking the write lock
+        added = []
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            for e in entries:
+                if self.poll_limit and len(added) >= self.poll_limit:
+                    break
+                cur = db.execute('INSERT OR IGNORE INTO jobs (video_id, duration, published, first_seen, updated_at) '
+                                 'VALUES (?, ?, ?, ?, ?)',
+                                 (e['id'], e.get('duration') or durations.get(e['id']), e.get('published'), now, now))
+                if cur.rowcount:
+                    added.append(e['id'])
+            db.execute('COMMIT')
+        return added
+
+    def claim_poll(self, interval):
+        """Return True for exactly one caller per poll interval across all workers."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            row = db.execute("SELECT value FROM meta WHERE key = 'last_poll'").fetchone()
+            due = row is None or now - float(row[0]) >= interval
+            if due:
+                db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_poll', ?)", (str(now),))
+            db.execute('COMMIT')
+        return due
+
+    def claim(self, worker_id):
+        """Lease the highest-priority queued (or lease-expired) job; returns a Lease or None."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            db.execute("UPDATE jobs SET state = 'failed', lease_owner = NULL, updated_at = ? "
+                       "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                       (now, now, self.max_attempts))
+            rows = db.execute(
+                "SELECT video_id, duration, published, first_seen, lease_owner, state FROM jobs "
+                "WHERE (state = 'queued' OR (state = 'leased' AND lease_expires < ?)) AND attempts < ?",
+                (now, self.max_attempts)).fetchall()
+            if not rows:
+                db.execute('COMMIT')
+                return None
+            jobs = [{'id': r[0], 'duration': r[1], 'published': r[2], 'first_seen': r[3],
+                     'owner': r[4], 'state': r[5]} for r in rows]
+            row = db.execute("SELECT value FROM meta WHERE key = 'since_starving'").fetchone()
+            since_starving = int(row[0]) if row else 0
+            job = pick_job(jobs, now, self.ordering, since_starving)
+            since_starving = 0 if is_starving(job, now, self.ordering) else since_starving + 1
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('since_starving', ?)", (str(since_starving),))
+            if job['state'] == 'leased':
+                logging.warning('Reclaiming %s from expired lease of %s', job['id'], job['owner'])
+            db.execute("UPDATE jobs SET state = 'leased', lease_owner = ?, lease_token = lease_token + 1, "
+                       "lease_expires = ?, attempts = attempts + 1, updated_at = ? WHERE video_id = ?",
+                       (worker_id, now + self.lease_seconds, now, job['id']))
+            token = db.execute('SELECT lease_token FROM jobs WHERE video_id = ?', (job['id'],)).fetchone()[0]
+            db.execute('COMMIT')
+        return Lease(job['id'], token, worker_id)
+
+    def _owns(self, db, lease):
+        row = db.execute("SELECT 1 FROM jobs WHERE video_id = ? AND lease_token = ? AND state = 'leased' "
+                         "AND lease_expires >= ?", (lease.video_id, lease.token, time.time())).fetchone()
+        return row is not None
+
+    def heartbeat(self, lease):
+        """Extend the lease; returns False if it was lost (expired and reclaimed, or finished)."""
+        now = time.time()
+        with self._connect() as db:
+            cur = db.execute("UPDATE jobs SET lease_expires = ?, updated_at = ? "
+                             "WHERE video_id = ? AND lease_token = ? AND state = 'leased'",
+                             (now + self.lease_seconds, now, lease.video_id, lease.token))
+            return cur.rowcount == 1
+
+    def begin_upload(self, lease, lang):
+        """Record that an upload starts; False if the lease is lost or this dub was already (being) uploaded."""
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            ok = self._owns(db, lease)
+            if ok:
+                row = db.execute('SELECT state, worker FROM uploads WHERE video_id = ? AND lang = ?',
+                                 (lease.video_id, lang)).fetchone()
+                if row is not None:
+                    if row[0] == 'started':
+                        logging.warning('Upload of %s/%s was started by %s and never confirmed; check the channel',
+                                        lease.video_id, lang, row[1])
+                    ok = False
+                else:
+                    db.execute("INSERT INTO uploads (video_id, lang, state, worker, updated_at) "
+                               "VALUES (?, ?, 'started', ?, ?)", (lease.video_id, lang, lease.worker_id, time.time()))
+            db.execute('COMMIT')
+        return ok
+
+    def finish_upload(self, lease, lang, youtube_id):
+        """Mark a started upload as done."""
+        with self._connect() as db:
+            db.execute("UPDATE uploads SET state = 'done', youtube_id = ?, updated_at = ? "
+                       "WHERE video_id = ? AND lang = ?", (youtube_id, time.time(), lease.video_id, lang))
+
+    def uploads(self, video_id):
+        """Return {lang: YouTube id} of the finished uploads of a video."""
+        with self._connect() as db:
+            rows = db.execute("SELECT lang, youtube_id FROM uploads WHERE video_id = ? AND state = 'done'",
+                              (video_id,)).fetchall()
+        return dict(rows)
+
+    def abort_upload(self, lease, lang):
+        """Drop the record of an upload that failed with an error, so the next attempt uploads it again."""
+        with self._connect() as db:
+            db.execute("DELETE FROM uploads WHERE video_id = ? AND lang = ? AND state = 'started' AND worker = ?",
+                       (lease.video_id, lang, lease.worker_id))
+
+    def complete(self, lease, result=None):
+        """Mark the job done with a JSON-serialisable result; False if the lease was lost."""
+        with self._connect() as db:
+            cur = db.execute("UPDATE jobs SET state = 'done', result = ?, lease_owner = NULL, lease_expires = NULL, "
+                             "updated_at = ? WHERE video_id = ? AND lease_token = ? AND state = 'leased'",
+                             (json.dumps(result), time.time(), lease.video_id, lease.token))
+            return cur.rowcount == 1
+
+    def fail(self, lease, error):
+        """Release a job after an error: back to the queue, or 'failed' once max_attempts is reached."""
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                       "result = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                       "WHERE video_id = ? AND lease_token = ? AND state = 'leased'",
+                       (self.max_attempts, json.dumps({'error': str(error)}), time.time(),
+                        lease.video_id, lease.token))
+
+
+class _Connection:
+    """sqlite3 connection that is closed (not just committed) when the with-block ends."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.conn.in_transaction:
+            self.conn.execute('ROLLBACK')
+        self.conn.close()
+
+
+class LeaseKeeper:
+    """Background heartbeat for a lease; `lost` is set once a renewal fails."""
+
+    def __init__(self, store, lease, interval):
+        self.store = store
+        self.lease = lease
+        self.interval = interval
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.store.heartbeat(self.lease):
+                    logging.error('Lease on %s lost', self.lease.video_id)
+                    self.lost.set()
+                    return
+            except sqlite3.Error as e:
+                logging.warning('Heartbeat for %s failed: %s', self.lease.video_id, e)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+
+
+class UploadGuard:
+    """Adapter passed to pipeline_main.process_video so uploads go through the job store."""
+
+    def __init__(self, store, lease, keeper=None):
+        self.store = store
+        self.lease = lease
+        self.keeper = keeper
+
+    def uploaded(self):
+        return self.store.uploads(self.lease.video_id)
+
+    def begin(self, lang):
+        if self.keeper is not None and self.keeper.lost.is_set():
+            return False
+        return self.store.begin_upload(self.lease, lang)
+
+    def finish(self, lang, resp):
+        self.store.finish_upload(self.lease, lang, resp.get('id'))
+
+    def abort(self, lang, error):
+        self.store.abort_upload(self.lease, lang)
+
+    def done(self):
+        # recorded by the worker loop with JobStore.complete(), not in a per-host file
+        pass
@@ -2,22 +2,77 @@ import time
 import logging
 import os
 from pathlib import Path
-from utils import load_config, setup_logging, ensure_dir
-from watcher import poll_channel_and_enqueue, mark_processed
+from utils import get_config, get_tmp_dir, setup_logging
+from watcher import poll_channel_entries, LocalUploads
 from driver import is_video_cc, download_video, get_video_duration
-from processor import process_video_file
+from processor import process_video_file_multi
+import resources
+from job_queue import JobQueue
 from uploader import get_youtube_service, upload_video_to_youtube
 
-cfg = load_config('config.json')
-setup_logging()
-TMP = cfg.get('TMP_DIR', '/tmp/autodubber')
-ensure_dir(TMP)
+IS_SHORT = False  # False للفيديو العادي، True للشورت / الريلز
 
-MAX_DURATION_NORMAL = cfg.get("VIDEO_FILTER", {}).get("MAX_DURATION_NORMAL", 900)
-MAX_DURATION_SHORT = cfg.get("VIDEO_FILTER", {}).get("MAX_DURATION_SHORT", 60)
-MIN_DURATION = cfg.get("VIDEO_FILTER", {}).get("MIN_DURATION", 5)
+DEFAULT_DESCRIPTION = "مترجم ومدبلج آلياً. المصدر: {url} | License: {license}"
+
+
+def init_runtime(worker=False):
+    """Per-process setup (logging, TMP_DIR, resource budgets); returns the config.
+    Workers get 1/WORKER.WORKERS_PER_HOST of the resource budget.
+    Kept out of import time so importing this module stays cheap.
+    """
+    cfg = get_config()
+    setup_logging()
+    get_tmp_dir()
+    share = cfg.get('WORKER', {}).get('WORKERS_PER_HOST', 1) if worker else 1
+    resources.configure(cfg.get('RESOURCES', {}), share)
+    return cfg
+
+
+def get_targets(cfg):
+    """Return the list of dub targets (one per language) from config.
+    Each target may override the YouTube OAuth files so it is published on its own channel.
+    """
+    targets = cfg.get('TARGETS') or [{'LANG': 'ar', 'TITLE_PREFIX': '[AR]'}]
+    out = []
+    for t in targets:
+        lang = t['LANG']
+        out.append({
+            'LANG': lang,
+            'TTS_LANG': t.get('TTS_LANG', lang),
+            'TITLE_PREFIX': t.get('TITLE_PREFIX', f'[{lang.upper()}]'),
+            'DESCRIPTION': t.get('DESCRIPTION', DEFAULT_DESCRIPTION),
+            'CLIENT_SECRETS_FILE': t.get('CLIENT_SECRETS_FILE', cfg['YOUTUBE']['CLIENT_SECRETS_FILE']),
+            'CREDENTIALS_STORE': t.get('CREDENTIALS_STORE', cfg['YOUTUBE']['CREDENTIALS_STORE']),
+        })
+    return out
+
+
+def get_fingerprint_index(cfg, default_db='fingerprints.sqlite'):
+    """Return the duplicate-detection index, or None when DEDUP is disabled.
+    DEDUP.DB_PATH overrides default_db (worker mode passes the shared job store).
+    """
+    dedup = cfg.get('DEDUP', {})
+    if not dedup.get('ENABLED', False):
+        return None
+    from fingerprint import FingerprintIndex
+    return FingerprintIndex(dedup.get('DB_PATH') or default_db, dedup.get('THRESHOLD', 0.35))
+
+
+def processing_options(cfg):
+    """Keyword arguments for processor.process_video_file_multi taken from config."""
+    segmentation = cfg.get('SEGMENTATION', {})
+    streaming = cfg.get('STREAMING', {})
+    return {
+        'max_unit_duration': segmentation.get('MAX_DURATION', 12.0),
+        'max_unit_gap': segmentation.get('MAX_GAP', 0.6),
+        'stream_opts': {
+            'queue_size': streaming.get('QUEUE_SIZE', 8),
+            'translate_workers': streaming.get('TRANSLATE_WORKERS', 2),
+            'tts_workers': streaming.get('TTS_WORKERS', 2),
+        },
+        'on_duplicate': cfg.get('DEDUP', {}).get('ACTION', 'skip'),
+    }
 
-IS_SHORT = False  # False للفيديو العادي، True للشورت / الريلز
 
 def cleanup_temp_files(video_id: str, tmp_dir: str):
     try:
@@ -31,67 +86,146 @@ def cleanup_temp_files(video_id: str, tmp_dir: str):
     except Exception as e:
         logging.error(f"Cleanup failed for {video_id}: {e}")
 
+
+def process_video(vid, targets, yt_services, fp_index=None, upload_guard=None):
+    """Download, dub and upload one video; every outcome except an error marks it processed.
+    upload_guard records the outcome (default: watcher.LocalUploads, the local processed store). It has
+    uploaded() -> {lang: YouTube id} of earlier attempts, begin(lang) -> bool, called before each upload
+    (False skips it), finish(lang, response), called after a successful upload, abort(lang, error),
+    called when it fails, and done(), called once the video is processed.
+    Languages uploaded by an earlier attempt are not dubbed again. If a language is still missing at
+    the end, RuntimeError is raised (after recording the others) so the job is retried for it.
+    Returns {lang: YouTube video id} of all uploads of the video.
+    """
+    try:
+        return _process_video(vid, targets, yt_services, fp_index, upload_guard)
+    finally:
+        if fp_index is not None:
+            # a fingerprint held but not committed (nothing uploaded) must not stay in memory
+            fp_index.discard(vid)
+
+
+def _process_video(vid, targets, yt_services, fp_index, upload_guard):
+    from fingerprint import DuplicateContent
+    guard = upload_guard or LocalUploads(vid)
+    uploaded = dict(guard.uploaded())
+    targets = [t for t in targets if t['LANG'] not in uploaded]
+    if not targets:
+        logging.info('All languages of %s are already uploaded', vid)
+        guard.done()
+        return uploaded
+    cfg = get_config()
+    tmp = get_tmp_dir()
+    video_filter = cfg.get('VIDEO_FILTER', {})
+    ok, meta = is_video_cc(vid)
+    if not ok:
+        logging.info('Skipping non-CC video %s', vid)
+        guard.done()
+        return uploaded
+
+    local_video = download_video(vid, tmp)
+    if not local_video:
+        logging.error('Download failed or skipped for %s', vid)
+        guard.done()
+        return uploaded
+
+    duration = get_video_duration(local_video)
+    max_dur = video_filter.get('MAX_DURATION_SHORT', 60) if IS_SHORT else video_filter.get('MAX_DURATION_NORMAL', 900)
+    if duration > max_dur or duration < video_filter.get('MIN_DURATION', 5):
+        logging.info(f"Skipping video {vid}: duration {duration}s outside allowed range.")
+        cleanup_temp_files(Path(local_video).stem, tmp)
+        guard.done()
+        return uploaded
+
+    try:
+        outputs = process_video_file_multi(
+            local_video,
+            [t['LANG'] for t in targets],
+            tts_langs={t['LANG']: t['TTS_LANG'] for t in targets},
+            fp_index=fp_index,
+            **processing_options(cfg)
+        )
+    except DuplicateContent as e:
+        logging.info('Skipping duplicate video: %s', e)
+        cleanup_temp_files(Path(local_video).stem, tmp)
+        guard.done()
+        return uploaded
+
+    missing = []
+    for t in targets:
+        final_video = outputs.get(t['LANG'])
+        if not final_video:
+            logging.error('No %s dub produced for %s', t['LANG'], vid)
+            missing.append(t['LANG'])
+            continue
+        store = t['CREDENTIALS_STORE']
+        if store not in yt_services:
+            yt_services[store] = get_youtube_service(t['CLIENT_SECRETS_FILE'], store)
+
+        title = f"{t['TITLE_PREFIX']} {meta.get('title', '')}"
+        desc = t['DESCRIPTION'].format(
+            url=f'https://www.youtube.com/watch?v={vid}',
+            license=meta.get('license', 'unknown')
+        )
+        if not guard.begin(t['LANG']):
+            logging.info('Skipping %s upload of %s: upload left unconfirmed or lease lost', t['LANG'], vid)
+            continue
+        try:
+            resp = upload_video_to_youtube(yt_services[store], final_video, title, desc)
+        except Exception as e:
+            logging.error('Upload of %s dub failed for %s: %s', t['LANG'], vid, e)
+            guard.abort(t['LANG'], e)
+            missing.append(t['LANG'])
+            continue
+        uploaded[t['LANG']] = resp.get('id')
+        guard.finish(t['LANG'], resp)
+    if fp_index is not None and uploaded:
+        # indexed only now: a failed attempt must not turn its own retry into a "duplicate"
+        fp_index.commit(vid)
+    if missing:
+        cleanup_temp_files(Path(local_video).stem, tmp)
+        raise RuntimeError(f"No {', '.join(missing)} dub of {vid} could be uploaded")
+
+    try:
+        os.remove(local_video)
+    except:
+        pass
+    cleanup_temp_files(Path(local_video).stem, tmp)
+    guard.done()
+    return uploaded
+
+
 def main_loop():
+    cfg = init_runtime()
     channel = cfg['SOURCE_CHANNEL_ID']
-    yt_service = None
+    targets = get_targets(cfg)
+    yt_services = {}  # credentials store -> authenticated service
+    fp_index = get_fingerprint_index(cfg)
+    jobs = JobQueue.from_config(cfg.get('QUEUE', {}))
+    poll_interval = cfg.get('POLL_INTERVAL_SECONDS', 300)
+    last_poll = None
 
     while True:
-        new_vids = poll_channel_and_enqueue(channel)
-        if not new_vids:
+        # re-poll between jobs so fresh uploads can overtake the backlog
+        if last_poll is None or time.time() - last_poll >= poll_interval:
+            jobs.extend(poll_channel_entries(channel))
+            last_poll = time.time()
+
+        job = jobs.pop()
+        if job is None:
             logging.info('No new videos. Sleeping...')
-            time.sleep(cfg.get('POLL_INTERVAL_SECONDS', 300))
+            # failed jobs waiting for a retry must not wait a whole poll interval
+            time.sleep(min(poll_interval, jobs.retry_delay) if len(jobs) else poll_interval)
             continue
 
-        for vid in new_vids:
-            try:
-                ok, meta = is_video_cc(vid)
-                if not ok:
-                    logging.info('Skipping non-CC video %s', vid)
-                    mark_processed(vid)
-                    continue
-
-                local_video = download_video(vid, TMP)
-                if not local_video:
-                    logging.error('Download failed or skipped for %s', vid)
-                    mark_processed(vid)
-                    continue
-
-                duration = get_video_duration(local_video)
-                max_dur = MAX_DURATION_SHORT if IS_SHORT else MAX_DURATION_NORMAL
-                if duration > max_dur or duration < MIN_DURATION:
-                    logging.info(f"Skipping video {vid}: duration {duration}s outside allowed range.")
-                    cleanup_temp_files(Path(local_video).stem, TMP)
-                    mark_processed(vid)
-                    continue
-
-                final_video = process_video_file(local_video)
-                if not final_video:
-                    logging.error('Processing failed for %s', vid)
-                    cleanup_temp_files(Path(local_video).stem, TMP)
-                    mark_processed(vid)
-                    continue
-
-                if not yt_service:
-                    yt_service = get_youtube_service(
-                        cfg['YOUTUBE']['CLIENT_SECRETS_FILE'],
-                        cfg['YOUTUBE']['CREDENTIALS_STORE']
-                    )
-
-                title = f"[AR] {meta.get('title', '')}"
-                desc = f"مترجم ومدبلج آلياً. المصدر: https://www.youtube.com/watch?v={vid} | License: {meta.get('license', 'unknown')}"
-                upload_video_to_youtube(yt_service, final_video, title, desc)
-
-                try:
-                    os.remove(local_video)
-                except:
-                    pass
-                cleanup_temp_files(Path(local_video).stem, TMP)
-                mark_processed(vid)
-
-            except Exception as e:
-                logging.exception('Error processing %s: %s', vid, e)
-
-        time.sleep(cfg.get('POLL_INTERVAL_SECONDS', 60))
+        vid = job['id']
+        try:
+            process_video(vid, targets, yt_services, fp_index)
+        except Exception as e:
+            logging.exception('Error processing %s: %s', vid, e)
+            if not jobs.retry(job):
+                logging.error('Giving up on %s after %d attempts', vid, jobs.max_attempts)
+                LocalUploads(vid).done()
 
 if __name__ == '__main__':
     main_loop()
@@ -1,27 +1,48 @@
 """
 Transcription -> Translation -> TTS -> Sync -> Merge
 This implementation uses Whisper (local CLI), LibreTranslate public endpoint, gTTS, and ffmpeg.
+numpy, requests and gTTS are imported inside the stages that use them, so importing this module is cheap.
 """
 import os
 import subprocess
 import json
 import logging
 import tempfile
-import shutil
+import wave
+import copy
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import requests
-from gtts import gTTS
 from utils import ensure_dir
+import resources
 
 TMP = '/tmp/autodubber'
-ensure_dir(TMP)
+
+# Re-segmentation limits: adjacent Whisper cues are merged into one unit (one translation,
+# one TTS call, one tempo pass) as long as the unit stays within these bounds.
+MAX_UNIT_DURATION = 12.0
+MAX_UNIT_GAP = 0.6
+SENTENCE_END = ('.', '!', '?', '…', '؟')
+
+# Streaming defaults: bounded queue size between stages and worker threads per stage.
+STREAM_QUEUE_SIZE = 8
+TRANSLATE_WORKERS = 2
+TTS_WORKERS = 2
+STOP_POLL_SECONDS = 0.2  # how often blocked stage threads check whether the stream was stopped
+
+# Dub track rendering: the track is mixed and written in windows of this many seconds.
+RENDER_WINDOW_SECONDS = 30
+RENDER_SAMPLE_RATE = 22050
 
 
 def extract_audio(video_path, out_wav):
     """Extract audio from video file using ffmpeg"""
-    cmd = ['ffmpeg', '-y', '-i', video_path, '-vn', '-acodec', 'pcm_s16le', '-ar', '16000', '-ac', '1', out_wav]
     try:
-        subprocess.check_call(cmd, stderr=subprocess.DEVNULL)
+        with resources.slot('ffmpeg') as threads:
+            cmd = ['ffmpeg', '-y', '-i', video_path, '-vn', '-acodec', 'pcm_s16le', '-ar', '16000', '-ac', '1',
+                   '-threads', str(threads), out_wav]
+            subprocess.check_call(cmd, stderr=subprocess.DEVNULL)
     except subprocess.CalledProcessError as e:
         logging.error(f"Audio extraction failed: {e}")
         raise
@@ -29,9 +50,11 @@ def extract_audio(video_path, out_wav):
 
 def whisper_transcribe_get_srt(audio_path):
     logging.info('Running whisper for %s', audio_path)
-    cmd = ['whisper', audio_path, '--model', 'small', '--output_format', 'srt', '--output_dir', TMP]
     try:
-        subprocess.check_call(cmd)
+        with resources.slot('whisper') as threads:
+            cmd = ['whisper', audio_path, '--model', 'small', '--output_format', 'srt', '--output_dir', TMP,
+                   '--threads', str(threads)]
+            subprocess.check_call(cmd, env=resources.thread_env(threads))
     except subprocess.CalledProcessError as e:
         logging.error(f"Whisper transcription failed: {e}")
         raise
@@ -60,151 +83,458 @@ def parse_srt(srt_path):
     return segments
 
 
-def translate_segments(segments, endpoint='https://libretranslate.de/translate', target='ar'):
-    """Translate text segments using LibreTranslate API"""
-    headers = {'Content-Type': 'application/json'}
+def resegment(segments, max_duration=MAX_UNIT_DURATION, max_gap=MAX_UNIT_GAP):
+    """Merge adjacent cues into sentence-level units.
+    A cue joins the current unit when the silence before it is <= max_gap, the unit would
+    still span <= max_duration, and the unit does not already end a sentence.
+    Each unit keeps the original cue timings in unit['parts'] so its audio can be split back.
+    """
+    units = []
+    cur = None
     for seg in segments:
-        if not seg['text'].strip():
-            seg['text_ar'] = seg['text']
+        part = {'start': seg['start'], 'end': seg['end']}
+        if (cur is not None
+                and seg['start'] - cur['end'] <= max_gap
+                and seg['end'] - cur['start'] <= max_duration
+                and not cur['text'].rstrip().endswith(SENTENCE_END)):
+            cur['end'] = seg['end']
+            cur['text'] = f"{cur['text']} {seg['text']}".strip()
+            cur['parts'].append(part)
             continue
-        payload = {'q': seg['text'], 'source': 'en', 'target': target, 'format': 'text'}
-        try:
-            r = requests.post(endpoint, json=payload, headers=headers, timeout=30)
-            if r.ok:
-                seg['text_ar'] = r.json().get('translatedText', seg['text'])
-            else:
-                logging.error('Translation failed for: %s (Status: %d)', seg['text'], r.status_code)
-                seg['text_ar'] = seg['text']
-        except requests.RequestException as e:
-            logging.error('Translation request failed for: %s (%s)', seg['text'], e)
-            seg['text_ar'] = seg['text']
-    return segments
+        cur = {'start': seg['start'], 'end': seg['end'], 'text': seg['text'], 'parts': [part]}
+        units.append(cur)
+    logging.info('Re-segmented %d cues into %d units', len(segments), len(units))
+    return units
 
 
-def tts_segments_and_sync(segments, voice_prefix='tts_seg'):
-    """Generate TTS audio for each segment and adjust timing"""
-    files = []
-    for i,seg in enumerate(segments):
-        text = seg.get('text_ar') or seg['text']
-        if not text.strip():
-            seg['tts_path'] = None
-            continue
-        out_mp3 = str(Path(TMP) / f"{voice_prefix}_{i}.mp3")
-        try:
-            tts = gTTS(text=text, lang='ar')
-            tts.save(out_mp3)
-        except Exception as e:
-            logging.error(f"TTS generation failed for segment {i}: {e}")
-            seg['tts_path'] = None
+def shift_segments(segments, shift, duration=None):
+    """Return copies of segments moved `shift` seconds later (earlier if negative), e.g. to reuse
+    a transcription on a copy of the video with an intro added or trimmed. Segments that end up
+    before 0 or after `duration` are dropped; the parts of merged units move with them.
+    """
+    out = []
+    for seg in segments:
+        seg = copy.deepcopy(seg)
+        seg['start'] += shift
+        seg['end'] += shift
+        for p in seg.get('parts') or []:
+            p['start'] += shift
+            p['end'] += shift
+        if seg['start'] < 0 or (duration is not None and seg['end'] > duration):
             continue
-            
-        target_dur = seg['end'] - seg['start']
-        cmd_probe = ['ffprobe','-v','error','-select_streams','a:0',
-                     '-show_entries','stream=duration','-of','default=noprint_wrappers=1:nokey=1', out_mp3]
-        try:
-            out = subprocess.check_output(cmd_probe).decode().strip()
-            tts_dur = float(out)
-        except Exception:
-            tts_dur = target_dur
-        speed = tts_dur / target_dur if target_dur>0.01 else 1.0
-        atempo = max(0.5, min(1.0/speed if speed!=0 else 1.0, 2.0))
-        out_fixed = str(Path(TMP) / f"{voice_prefix}_{i}_fixed.mp3")
-        cmd_tempo = ['ffmpeg','-y','-i', out_mp3, '-filter:a', f"atempo={atempo}", out_fixed]
-        try:
-            subprocess.check_call(cmd_tempo, stderr=subprocess.DEVNULL)
-        except subprocess.CalledProcessError as e:
-            logging.error(f"Audio tempo adjustment failed for segment {i}: {e}")
-            seg['tts_path'] = out_mp3  # Use original if tempo adjustment fails
-            files.append(out_mp3)
+        out.append(seg)
+    return out
+
+
+def split_units(units):
+    """Map each unit's synthesized audio back onto its original cue timings.
+    Yields placements {'start', 'end', 'tts_path', 'clip_start', 'clip_end'} where the clip
+    bounds select the slice of tts_path played at 'start'. The last part of a unit keeps
+    clip_end=None so audio that overran the tempo clamp is not cut off.
+    """
+    for u in units:
+        if not u.get('tts_path'):
             continue
-        seg['tts_path'] = out_fixed
-        files.append(out_fixed)
+        parts = u.get('parts') or [{'start': u['start'], 'end': u['end']}]
+        cursor = 0.0
+        for j, p in enumerate(parts):
+            dur = p['end'] - p['start']
+            last = j == len(parts) - 1
+            yield {'start': p['start'], 'end': p['end'], 'tts_path': u['tts_path'],
+                   'clip_start': cursor, 'clip_end': None if last else cursor + dur}
+            cursor += dur
+
+
+def translate_segment(seg, endpoint='https://libretranslate.de/translate', target='ar'):
+    """Translate one segment using LibreTranslate API.
+    The translation is stored under seg['text_<target>'] (e.g. 'text_ar').
+    """
+    import requests
+    key = f'text_{target}'
+    if not seg['text'].strip():
+        seg[key] = seg['text']
+        return seg
+    headers = {'Content-Type': 'application/json'}
+    payload = {'q': seg['text'], 'source': 'en', 'target': target, 'format': 'text'}
+    try:
+        r = requests.post(endpoint, json=payload, headers=headers, timeout=30)
+        if r.ok:
+            seg[key] = r.json().get('translatedText', seg['text'])
+        else:
+            logging.error('Translation failed for: %s (Status: %d)', seg['text'], r.status_code)
+            seg[key] = seg['text']
+    except requests.RequestException as e:
+        logging.error('Translation request failed for: %s (%s)', seg['text'], e)
+        seg[key] = seg['text']
+    return seg
+
+
+def translate_segments(segments, endpoint='https://libretranslate.de/translate', target='ar'):
+    """Translate text segments using LibreTranslate API"""
+    for seg in segments:
+        translate_segment(seg, endpoint, target)
     return segments
 
 
-def build_full_dub_audio(segments, out_audio_path):
-    """Build complete dubbed audio track with proper timing."""
-    if not segments:
-        return None
-        
-    # Create silence for the full duration
-    total_dur = max([s['end'] for s in segments]) if segments else 10
-    temp_files = []
-    
-    # Create base silence
-    silence_file = str(Path(TMP) / 'base_silence.wav')
-    cmd_silence = ['ffmpeg', '-y', '-f', 'lavfi', '-i', 
-                   f'anullsrc=channel_layout=mono:sample_rate=22050', 
-                   '-t', str(total_dur + 1), silence_file]
+def tts_segment_and_sync(seg, i, voice_prefix='tts_seg', lang='ar', text_key=None):
+    """Generate TTS audio for one segment and stretch it to the segment timing.
+    Reads seg[text_key] (defaults to 'text_<lang>') and speaks it with gTTS in `lang`.
+    Sets seg['tts_path'] (None when nothing could be synthesized).
+    """
+    text_key = text_key or f'text_{lang}'
+    text = seg.get(text_key) or seg['text']
+    if not text.strip():
+        seg['tts_path'] = None
+        return seg
+    out_mp3 = str(Path(TMP) / f"{voice_prefix}_{i}.mp3")
+    try:
+        from gtts import gTTS
+        tts = gTTS(text=text, lang=lang)
+        tts.save(out_mp3)
+    except Exception as e:
+        logging.error(f"TTS generation failed for segment {i}: {e}")
+        seg['tts_path'] = None
+        return seg
+
+    # merged units are stretched to their speech time only; split_units re-inserts the gaps
+    parts = seg.get('parts')
+    target_dur = sum(p['end'] - p['start'] for p in parts) if parts else seg['end'] - seg['start']
+    cmd_probe = ['ffprobe','-v','error','-select_streams','a:0',
+                 '-show_entries','stream=duration','-of','default=noprint_wrappers=1:nokey=1', out_mp3]
+    try:
+        with resources.slot('ffmpeg'):
+            out = subprocess.check_output(cmd_probe).decode().strip()
+        tts_dur = float(out)
+    except Exception:
+        tts_dur = target_dur
+    speed = tts_dur / target_dur if target_dur>0.01 else 1.0
+    atempo = max(0.5, min(1.0/speed if speed!=0 else 1.0, 2.0))
+    out_fixed = str(Path(TMP) / f"{voice_prefix}_{i}_fixed.mp3")
     try:
-        subprocess.check_call(cmd_silence, stderr=subprocess.DEVNULL)
+        with resources.slot('ffmpeg') as threads:
+            cmd_tempo = ['ffmpeg','-y','-i', out_mp3, '-filter:a', f"atempo={atempo}", '-threads', str(threads), out_fixed]
+            subprocess.check_call(cmd_tempo, stderr=subprocess.DEVNULL)
     except subprocess.CalledProcessError as e:
-        logging.error(f"Failed to create silence track: {e}")
-        return None
-    temp_files.append(silence_file)
-    
-    # Overlay each TTS segment at the correct time
-    current_input = silence_file
-    for s in segments:
-        if not s.get('tts_path') or not os.path.exists(s['tts_path']):
-            continue
-            
-        # Create output for this overlay
-        next_output = str(Path(TMP) / f'overlay_{len(temp_files)}.wav')
-        
-        # Overlay TTS at the correct timestamp
-        cmd_overlay = ['ffmpeg', '-y', '-i', current_input, '-i', s['tts_path'],
-                      '-filter_complex', f'[1:a]adelay={int(s["start"]*1000)}|{int(s["start"]*1000)}[delayed];[0:a][delayed]amix=inputs=2:dropout_transition=0',
-                      next_output]
+        logging.error(f"Audio tempo adjustment failed for segment {i}: {e}")
+        seg['tts_path'] = out_mp3  # Use original if tempo adjustment fails
+        return seg
+    _remove_quietly(out_mp3)  # only the stretched clip is mixed
+    seg['tts_path'] = out_fixed
+    return seg
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def tts_segments_and_sync(segments, voice_prefix='tts_seg', lang='ar', text_key=None):
+    """Generate TTS audio for each segment and adjust timing"""
+    for i,seg in enumerate(segments):
+        tts_segment_and_sync(seg, i, voice_prefix, lang, text_key)
+    return segments
+
+
+def _put(q, item, stop):
+    """Put item on q unless stop is set first; returns False if it was not put."""
+    while not stop.is_set():
         try:
-            subprocess.check_call(cmd_overlay, stderr=subprocess.DEVNULL)
-            temp_files.append(next_output)
-            current_input = next_output
-        except subprocess.CalledProcessError as e:
-            logging.error(f"Failed to overlay segment: {e}")
-            continue
-    
-    # Copy final result to output path
-    if current_input != silence_file:
-        shutil.copy2(current_input, out_audio_path)
-    else:
-        shutil.copy2(silence_file, out_audio_path)
-    
-    # Cleanup temp files
-    for f in temp_files:
+            q.put(item, timeout=STOP_POLL_SECONDS)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(q, stop):
+    """Return the next item of q, or None once stop is set."""
+    while not stop.is_set():
         try:
-            os.remove(f)
-        except:
+            return q.get(timeout=STOP_POLL_SECONDS)
+        except queue.Empty:
             pass
-            
+    return None
+
+
+def _start_stage(func, inbox, outbox, workers, downstream_workers, stop):
+    """Start `workers` threads applying func(i, seg) to items from inbox.
+    Each worker stops on a None sentinel or when `stop` is set; once all of them have stopped, one
+    sentinel per downstream worker is put on outbox. Returns the started threads.
+    """
+    def work():
+        while True:
+            item = _get(inbox, stop)
+            if item is None:
+                return
+            i, seg = item
+            try:
+                func(i, seg)
+            except Exception as e:
+                logging.error(f"Pipeline stage failed for segment {i}: {e}")
+                seg.setdefault('tts_path', None)
+            if not _put(outbox, (i, seg), stop):
+                return
+
+    worker_threads = [threading.Thread(target=work, daemon=True) for _ in range(workers)]
+
+    def close():
+        for t in worker_threads:
+            t.join()
+        for _ in range(downstream_workers):
+            _put(outbox, None, stop)
+
+    threads = worker_threads + [threading.Thread(target=close, daemon=True)]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def stream_segments(segments, target='ar', tts_lang=None, voice_prefix='tts_seg',
+                    endpoint='https://libretranslate.de/translate',
+                    queue_size=STREAM_QUEUE_SIZE, translate_workers=TRANSLATE_WORKERS, tts_workers=TTS_WORKERS):
+    """
+    Generator running translation and TTS/tempo as concurrent stages connected by bounded queues.
+    A segment moves to TTS as soon as its translation returns, and is yielded (in the original
+    order) as soon as its stretched audio exists, so the caller can start mixing it right away.
+    At most max_in_flight segments are between the feeder and the caller at any time, which also
+    bounds the reorder buffer when one segment is slow. If the caller stops early (an exception
+    while mixing, or closing the generator), every stage thread is stopped before it returns.
+    """
+    tts_lang = tts_lang or target
+    text_key = f'text_{target}'
+    to_translate = queue.Queue(maxsize=queue_size)
+    to_tts = queue.Queue(maxsize=queue_size)
+    done = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    # enough to keep every queue full and every worker busy
+    max_in_flight = 3 * queue_size + translate_workers + tts_workers
+    in_flight = threading.Semaphore(max_in_flight)
+
+    def feed():
+        for item in enumerate(segments):
+            while not in_flight.acquire(timeout=STOP_POLL_SECONDS):
+                if stop.is_set():
+                    return
+            if not _put(to_translate, item, stop):
+                return
+        for _ in range(translate_workers):
+            _put(to_translate, None, stop)
+
+    threads = [threading.Thread(target=feed, daemon=True)]
+    threads[0].start()
+    threads += _start_stage(lambda i, seg: translate_segment(seg, endpoint, target),
+                            to_translate, to_tts, translate_workers, tts_workers, stop)
+    threads += _start_stage(lambda i, seg: tts_segment_and_sync(seg, i, voice_prefix, tts_lang, text_key),
+                            to_tts, done, tts_workers, 1, stop)
+
+    # re-establish the original order; the buffer only holds segments that overtook a slower one
+    pending = {}
+    next_i = 0
+    try:
+        while True:
+            item = done.get()
+            if item is None:
+                break
+            pending[item[0]] = item[1]
+            while next_i in pending:
+                in_flight.release()
+                yield pending.pop(next_i)
+                next_i += 1
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+
+
+def decode_audio_samples(path, sample_rate=RENDER_SAMPLE_RATE):
+    """Decode an audio file to mono int16 samples at sample_rate using ffmpeg"""
+    import numpy as np
+    with resources.slot('ffmpeg') as threads:
+        cmd = ['ffmpeg', '-v', 'error', '-i', path, '-f', 's16le', '-acodec', 'pcm_s16le',
+               '-ac', '1', '-ar', str(sample_rate), '-threads', str(threads), '-']
+        out = subprocess.check_output(cmd)
+    return np.frombuffer(out, dtype=np.int16)
+
+
+def render_dub_track(segments, out_audio_path, total_dur=None,
+                     window_seconds=RENDER_WINDOW_SECONDS, sample_rate=RENDER_SAMPLE_RATE):
+    """Render the dubbed audio track as a WAV file, one fixed-size time window at a time.
+    `segments` are placements sorted by start (a generator is fine, see split_units), and the
+    slices of one clip arrive one after another. Each clip is decoded once and only the placements
+    overlapping the current window are kept in memory, so peak memory does not grow with the source
+    length. A clip file is deleted as soon as it is fully mixed, so the TTS clips on disk stay bounded
+    too; the output WAV itself is written at full length.
+    """
+    import numpy as np
+    win = max(1, int(window_seconds * sample_rate))
+    active = []   # [start_sample, samples, tts_path] still overlapping the unwritten part of the track
+    decoded = {}  # tts_path -> samples, shared by the slices of one unit
+    finished = set()  # tts paths no later placement refers to
+    last_path = None
+    pos = 0       # first sample of the current window
+
+    with wave.open(out_audio_path, 'wb') as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(sample_rate)
+
+        def write_window(length):
+            nonlocal pos, active
+            end = pos + length
+            buf = np.zeros(length, dtype=np.int32)
+            for start, samples, _ in active:
+                lo, hi = max(start, pos), min(start + len(samples), end)
+                if lo < hi:
+                    buf[lo - pos:hi - pos] += samples[lo - start:hi - start]
+            out.writeframes(np.clip(buf, -32768, 32767).astype('<i2').tobytes())
+            pos = end
+            active = [a for a in active if a[0] + len(a[1]) > pos]
+            live = {a[2] for a in active}
+            for path in [p for p in decoded if p not in live and p in finished]:
+                del decoded[path]
+                _remove_quietly(path)
+
+        for s in segments:
+            if not s.get('tts_path'):
+                continue
+            if s['tts_path'] != last_path:
+                if last_path is not None:
+                    finished.add(last_path)
+                last_path = s['tts_path']
+            if not os.path.exists(s['tts_path']):
+                continue
+            start = int(s['start'] * sample_rate)
+            # everything before this placement is final: placements arrive sorted by start
+            while pos + win <= start:
+                write_window(win)
+            if s['tts_path'] not in decoded:
+                try:
+                    decoded[s['tts_path']] = decode_audio_samples(s['tts_path'], sample_rate)
+                except (subprocess.CalledProcessError, OSError) as e:
+                    logging.error(f"Failed to decode {s['tts_path']}: {e}")
+                    continue
+            samples = decoded[s['tts_path']]
+            lo = int((s.get('clip_start') or 0) * sample_rate)
+            hi = len(samples) if s.get('clip_end') is None else int(s['clip_end'] * sample_rate)
+            clip = samples[lo:hi]
+            if start < pos:
+                logging.warning('Segment at %.2fs arrived after its window was written; truncating it', s['start'])
+                clip, start = clip[pos - start:], pos
+            if len(clip):
+                active.append([start, clip, s['tts_path']])
+
+        finished.add(last_path)
+        end = int(((total_dur or 0) + 1) * sample_rate)
+        end = max([end] + [a[0] + len(a[1]) for a in active])
+        while pos < end:
+            write_window(min(win, end - pos))
+
     return out_audio_path
 
 
 def mix_dub_over_video(orig_video, dub_audio, out_video, original_audio_reduce=0.15):
     """Mix dubbed audio with original video, reducing original audio volume"""
-    cmd = ['ffmpeg','-y','-i', orig_video, '-i', dub_audio,
-           '-filter_complex', f"[0:a]volume={original_audio_reduce}[a0];[a0][1:a]amix=inputs=2:dropout_transition=0", '-c:v', 'copy', out_video]
     try:
-        subprocess.check_call(cmd, stderr=subprocess.DEVNULL)
+        with resources.slot('mux') as threads:
+            cmd = ['ffmpeg','-y','-i', orig_video, '-i', dub_audio,
+                   '-filter_complex', f"[0:a]volume={original_audio_reduce}[a0];[a0][1:a]amix=inputs=2:dropout_transition=0", '-c:v', 'copy',
+                   '-threads', str(threads), out_video]
+            subprocess.check_call(cmd, stderr=subprocess.DEVNULL)
     except subprocess.CalledProcessError as e:
         logging.error(f"Video mixing failed: {e}")
         raise
 
 
-def process_video_file(local_video_path):
+def transcribe_video_file(local_video_path, max_unit_duration=MAX_UNIT_DURATION, max_unit_gap=MAX_UNIT_GAP,
+                          fp_index=None, on_duplicate='skip'):
     """
-    end-to-end processing for one local video file
-    returns the path to the processed video
+    language-independent stages for one local video file (audio extraction + Whisper + re-segmentation)
+    with fp_index (a FingerprintIndex), the extracted audio is fingerprinted first; a near-duplicate
+    of indexed content raises DuplicateContent, or with on_duplicate='reuse' returns the cached
+    transcription of the original (moved by the offset between the two, see shift_segments)
+    instead of running Whisper again
+    the new fingerprint is only held; the caller indexes it with fp_index.commit() once the dub is published
+    returns the source units
     """
+    ensure_dir(TMP)
     base = Path(local_video_path).stem
     audio_wav = str(Path(TMP)/f'{base}.wav')
     extract_audio(local_video_path, audio_wav)
+
+    fp = duration = None
+    if fp_index is not None:
+        from fingerprint import compute_fingerprint, DuplicateContent
+        fp, duration = compute_fingerprint(audio_wav)
+        match = fp_index.lookup(fp, duration, base)
+        if match:
+            match_id, ber, shift = match
+            cached = fp_index.load_transcript(match_id) if on_duplicate == 'reuse' else None
+            if cached is None:
+                raise DuplicateContent(base, match_id, ber)
+            logging.info('%s duplicates %s (bit error rate %.3f, shifted %.2fs); reusing its transcription',
+                         base, match_id, ber, shift)
+            return shift_segments(cached, shift, duration)
+
     srt = whisper_transcribe_get_srt(audio_wav)
-    segments = parse_srt(srt)
-    segments = translate_segments(segments)
-    segments = tts_segments_and_sync(segments)
-    dub_audio = str(Path(TMP)/f'{base}_dub.mp3')
-    build_full_dub_audio(segments, dub_audio)
-    out_video = str(Path(TMP)/f'{base}_ar_dub.mp4')
+    segments = resegment(parse_srt(srt), max_unit_duration, max_unit_gap)
+    if fp_index is not None:
+        fp_index.hold(base, fp, duration, segments)
+    return segments
+
+
+def dub_video_file(local_video_path, segments, target='ar', tts_lang=None, stream_opts=None):
+    """
+    per-language stages: translation -> TTS -> dub track -> merge
+    translation, TTS and dub-track mixing overlap segment by segment (see stream_segments)
+    `segments` is not modified, so the same transcription can be shared between languages
+    returns the path to the dubbed video
+    """
+    if not segments:
+        return None
+    ensure_dir(TMP)
+    base = Path(local_video_path).stem
+    prefix = f'{base}_{target}'
+    segments = copy.deepcopy(segments)
+    total_dur = max(s['end'] for s in segments)
+    ready = stream_segments(segments, target=target, tts_lang=tts_lang,
+                            voice_prefix=f'{prefix}_tts', **(stream_opts or {}))
+    dub_audio = str(Path(TMP)/f'{prefix}_dub.wav')
+    render_dub_track(split_units(ready), dub_audio, total_dur=total_dur)
+    out_video = str(Path(TMP)/f'{prefix}_dub.mp4')
     mix_dub_over_video(local_video_path, dub_audio, out_video)
     return out_video
+
+
+def process_video_file_multi(local_video_path, languages, tts_langs=None,
+                             max_unit_duration=MAX_UNIT_DURATION, max_unit_gap=MAX_UNIT_GAP, stream_opts=None,
+                             fp_index=None, on_duplicate='skip'):
+    """
+    end-to-end processing for one local video file into several languages
+    download/extraction/transcription are paid once; every language then runs in its own thread
+    returns {language: path to the processed video or None if that language failed}
+    """
+    tts_langs = tts_langs or {}
+    segments = transcribe_video_file(local_video_path, max_unit_duration, max_unit_gap,
+                                     fp_index=fp_index, on_duplicate=on_duplicate)
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, len(languages))) as pool:
+        futures = {lang: pool.submit(dub_video_file, local_video_path, segments, lang,
+                                       tts_langs.get(lang), stream_opts)
+                   for lang in languages}
+        for lang, fut in futures.items():
+            try:
+                results[lang] = fut.result()
+            except Exception as e:
+                logging.error(f"Dubbing to '{lang}' failed for {local_video_path}: {e}")
+                results[lang] = None
+    return results
+
+
+def process_video_file(local_video_path):
+    """
+    end-to-end processing for one local video file
+    returns the path to the processed video
+    """
+    return dub_video_file(local_video_path, transcribe_video_file(local_video_path), 'ar')
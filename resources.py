@@ -0,0 +1,128 @@
+"""
+CPU/memory aware scheduling of the heavy stages (Whisper, ffmpeg, OpenCV).
+Each stage asks for a slot with a thread and memory budget; when the host is full it waits
+instead of oversubscribing the cores. The granted thread count is what the stage passes on
+(ffmpeg -threads, whisper --threads / OMP_NUM_THREADS, cv2.setNumThreads).
+The budget is per process. Worker mode divides CPU_SLOTS / MEMORY_MB (or the host's CPUs and RAM)
+by WORKER.WORKERS_PER_HOST, so workers started side by side together stay within the host.
+"""
+import os
+import logging
+import threading
+from contextlib import contextmanager
+
+# Default budget per stage: threads (None = every CPU slot) and resident memory in MB.
+DEFAULT_STAGES = {
+    'whisper': {'THREADS': None, 'MEMORY_MB': 2000},
+    'ffmpeg': {'THREADS': 1, 'MEMORY_MB': 150},
+    'mux': {'THREADS': 2, 'MEMORY_MB': 300},
+    'opencv': {'THREADS': 1, 'MEMORY_MB': 200},
+}
+
+
+def available_cpus():
+    """Number of CPUs this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+
+def available_memory_mb():
+    """Physical memory of the host in MB, or None if it cannot be determined."""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class ResourceManager:
+    """Hands out CPU slots and memory to stages and blocks while they are exhausted."""
+
+    def __init__(self, cpu_slots=None, memory_mb=None, stages=None, share=1):
+        """share: number of processes splitting this budget (workers per host)."""
+        share = max(1, share or 1)
+        self.cpu_slots = max(1, (cpu_slots or available_cpus()) // share)
+        self.memory_mb = memory_mb or available_memory_mb()
+        if self.memory_mb is not None:
+            self.memory_mb //= share
+        self.stages = {k: dict(v) for k, v in DEFAULT_STAGES.items()}
+        for name, budget in (stages or {}).items():
+            self.stages.setdefault(name, {}).update(budget)
+        self._free_cpu = self.cpu_slots
+        self._free_mem = self.memory_mb
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_config(cls, settings, share=1):
+        """Build from the RESOURCES config section."""
+        return cls(settings.get('CPU_SLOTS'), settings.get('MEMORY_MB'), settings.get('STAGES'), share)
+
+    def budget(self, stage):
+        """Return (threads, memory_mb) granted to one run of `stage`."""
+        b = self.stages.get(stage, DEFAULT_STAGES['ffmpeg'])
+        threads = min(b.get('THREADS') or self.cpu_slots, self.cpu_slots)
+        mem = b.get('MEMORY_MB') or 0
+        if self.memory_mb is not None:
+            mem = min(mem, self.memory_mb)
+        return threads, mem
+
+    def _fits(self, threads, mem):
+        return self._free_cpu >= threads and (self._free_mem is None or self._free_mem >= mem)
+
+    @contextmanager
+    def slot(self, stage):
+        """Context manager that waits for the stage's budget and yields its thread count."""
+        threads, mem = self.budget(stage)
+        with self._cond:
+            if not self._fits(threads, mem):
+                logging.debug('Waiting for %d CPU slot(s) / %d MB for %s', threads, mem, stage)
+            self._cond.wait_for(lambda: self._fits(threads, mem))
+            self._free_cpu -= threads
+            if self._free_mem is not None:
+                self._free_mem -= mem
+        try:
+            yield threads
+        finally:
+            with self._cond:
+                self._free_cpu += threads
+                if self._free_mem is not None:
+                    self._free_mem += mem
+                self._cond.notify_all()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def configure(settings=None, share=1):
+    """Replace the process-wide manager using the RESOURCES config section;
+    share is the number of processes on this host splitting it.
+    """
+    global _manager
+    with _manager_lock:
+        _manager = ResourceManager.from_config(settings or {}, share)
+        logging.info('Resource manager: %d CPU slot(s), %s MB', _manager.cpu_slots, _manager.memory_mb)
+    return _manager
+
+
+def get_manager():
+    """Return the process-wide manager, creating a default one on first use."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ResourceManager()
+    return _manager
+
+
+def slot(stage):
+    """Shortcut for get_manager().slot(stage)."""
+    return get_manager().slot(stage)
+
+
+def thread_env(threads):
+    """Environment for a subprocess limited to `threads` BLAS/OpenMP/CTranslate2 threads."""
+    env = dict(os.environ)
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        env[var] = str(threads)
+    return env
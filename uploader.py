@@ -1,19 +1,19 @@
 """
 Upload a final file to YouTube via OAuth2 interactive flow.
+The Google client libraries are imported on first use so that importing this module stays cheap.
 """
 import os
 import json
 import logging
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
 
 SCOPES = ['https://www.googleapis.com/auth/youtube.upload']
 
 
 def get_youtube_service(client_secrets_file, credentials_store):
     """Get authenticated YouTube service using OAuth2 flow"""
+    from google.auth.transport.requests import Request
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build
     # Check if credentials file exists and is valid
     if os.path.exists(credentials_store):
         try:
@@ -39,6 +39,7 @@ def get_youtube_service(client_secrets_file, credentials_store):
 
 def upload_video_to_youtube(youtube_service, file_path, title, description, tags=None, privacy='public'):
     """Upload video file to YouTube with metadata"""
+    from googleapiclient.http import MediaFileUpload
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Video file not found: {file_path}")
     
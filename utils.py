@@ -2,6 +2,7 @@ import os
 import json
 import logging
 import sys
+import functools
 from pathlib import Path
 
 def ensure_dir(p):
@@ -33,6 +34,17 @@ def load_config(path='config.json'):
         
     return config
 
+@functools.lru_cache(maxsize=None)
+def get_config(path='config.json'):
+    """Load the configuration once per process (on first use, not at import time)."""
+    return load_config(path)
+
+def get_tmp_dir():
+    """Return the configured TMP_DIR, creating it if needed."""
+    tmp = get_config().get('TMP_DIR', '/tmp/autodubber')
+    ensure_dir(tmp)
+    return tmp
+
 def setup_logging(logpath=None, level=None):
     """Enhanced logging setup with console + file output."""
     if level is None:
@@ -8,8 +8,10 @@ import json
 import logging
 from pathlib import Path
 from utils import ensure_dir
+from job_queue import cache_durations
 
 PROCESSED_STORE = 'processed_videos.json'
+UPLOADS_STORE = 'uploads.json'  # {video id: {lang: YouTube id}} of videos not fully processed yet
 
 
 def load_processed():
@@ -27,9 +29,10 @@ def save_processed(s):
     p.write_text(json.dumps(list(s)), encoding='utf-8')
 
 
-def poll_channel_and_enqueue(channel_url_or_id, limit=10):
-    """Return list of video ids (strings) to process. Accepts a channel id or a channel URL.
-    Tries common URL patterns until it finds uploads.
+def poll_channel_entries(channel_url_or_id):
+    """Return unprocessed uploads of a channel as dicts {'id', 'duration', 'published'}.
+    Accepts a channel id or a channel URL and tries common URL patterns until it finds uploads.
+    Durations reported by the playlist are cached for job ordering (see job_queue).
     """
     logging.info(f'Polling channel {channel_url_or_id}')
     candidates = []
@@ -41,7 +44,7 @@ def poll_channel_and_enqueue(channel_url_or_id, limit=10):
         candidates.append(f'https://www.youtube.com/c/{channel_url_or_id}')
         candidates.append(f'https://www.youtube.com/user/{channel_url_or_id}')
 
-    vids = []
+    entries = []
     for url in candidates:
         cmd = ['yt-dlp', '--flat-playlist', '--dump-json', url]
         try:
@@ -54,18 +57,71 @@ def poll_channel_and_enqueue(channel_url_or_id, limit=10):
                 meta = json.loads(line.decode('utf-8'))
                 vid = meta.get('id')
                 if vid:
-                    vids.append(vid)
+                    entries.append({
+                        'id': vid,
+                        'duration': meta.get('duration'),
+                        'published': meta.get('timestamp') or meta.get('release_timestamp'),
+                    })
             except Exception:
                 continue
-        if vids:
+        if entries:
             break
 
+    cache_durations({e['id']: e['duration'] for e in entries})
     processed = load_processed()
-    new = [v for v in vids if v not in processed]
-    return new[:limit]
+    return [e for e in entries if e['id'] not in processed]
+
+
+def poll_channel_and_enqueue(channel_url_or_id, limit=10):
+    """Return list of video ids (strings) to process, in playlist order."""
+    return [e['id'] for e in poll_channel_entries(channel_url_or_id)][:limit]
 
 
 def mark_processed(vid):
     s = load_processed()
     s.add(vid)
-    save_processed(s)
\ No newline at end of file
+    save_processed(s)
+
+
+def _load_uploads():
+    p = Path(UPLOADS_STORE)
+    if not p.exists():
+        return {}
+    try:
+        return json.loads(p.read_text(encoding='utf-8'))
+    except Exception:
+        return {}
+
+
+def _save_uploads(d):
+    Path(UPLOADS_STORE).write_text(json.dumps(d), encoding='utf-8')
+
+
+class LocalUploads:
+    """Upload bookkeeping of the single-process loop: uploads are recorded per language until the
+    video is done, then it moves to the processed store.
+    Worker mode uses jobstore.UploadGuard instead, which keeps this state in the shared job store.
+    """
+
+    def __init__(self, video_id):
+        self.video_id = video_id
+
+    def uploaded(self):
+        return _load_uploads().get(self.video_id, {})
+
+    def begin(self, lang):
+        return True
+
+    def finish(self, lang, resp):
+        d = _load_uploads()
+        d.setdefault(self.video_id, {})[lang] = resp.get('id')
+        _save_uploads(d)
+
+    def abort(self, lang, error):
+        pass
+
+    def done(self):
+        mark_processed(self.video_id)
+        d = _load_uploads()
+        if d.pop(self.video_id, None) is not None:
+            _save_uploads(d)
\ No newline at end of file
@@ -0,0 +1,54 @@
+"""
+Worker mode: run any number of these processes, on one or many hosts, against one shared job store
+(WORKER.DB_PATH, e.g. on a shared volume). Each worker claims a job under a lease, keeps it alive with
+heartbeats while it downloads/dubs/uploads, and reports the result back; jobs of crashed workers are
+picked up again once their lease expires. Polling the source channel is done by one worker per interval.
+Job state, upload records and the duplicate-detection index all live in the shared store; the only
+per-host files are TMP_DIR and the duration cache (durations.json), which is just a cache.
+Usage: python worker.py
+"""
+import time
+import logging
+from pipeline_main import init_runtime, get_targets, get_fingerprint_index, process_video
+from watcher import poll_channel_entries
+from jobstore import JobStore, LeaseKeeper, UploadGuard, default_worker_id
+
+
+def worker_loop(worker_id=None):
+    cfg = init_runtime(worker=True)
+    settings = cfg.get('WORKER', {})
+    store = JobStore.from_config(settings, cfg.get('QUEUE', {}))
+    worker_id = worker_id or default_worker_id()
+    heartbeat = settings.get('HEARTBEAT_SECONDS', 60)
+    idle = settings.get('IDLE_SECONDS', 30)
+    poll_interval = cfg.get('POLL_INTERVAL_SECONDS', 300)
+    targets = get_targets(cfg)
+    yt_services = {}  # credentials store -> authenticated service
+    fp_index = get_fingerprint_index(cfg, store.db_path)  # shared with the other workers
+    logging.info('Worker %s using job store %s', worker_id, store.db_path)
+
+    while True:
+        if store.claim_poll(poll_interval):
+            try:
+                store.enqueue(poll_channel_entries(cfg['SOURCE_CHANNEL_ID']))
+            except Exception as e:
+                logging.exception('Polling failed: %s', e)
+
+        lease = store.claim(worker_id)
+        if lease is None:
+            time.sleep(idle)
+            continue
+
+        vid = lease.video_id
+        with LeaseKeeper(store, lease, heartbeat) as keeper:
+            try:
+                uploads = process_video(vid, targets, yt_services, fp_index, UploadGuard(store, lease, keeper))
+            except Exception as e:
+                logging.exception('Error processing %s: %s', vid, e)
+                store.fail(lease, e)
+                continue
+        if not store.complete(lease, {'uploads': uploads, 'worker': worker_id}):
+            logging.warning('Lease on %s was lost before completion; result not recorded', vid)
+
+if __name__ == '__main__':
+    worker_loop()